@@ -0,0 +1,139 @@
+import argparse as _argparse
+import collections as _collections
+import datetime as _datetime
+import itertools as _itertools
+import json as _json
+import logging as _logging
+import threading as _threading
+import time as _time
+
+import requests_ip_rotator.gateway as _gateway
+from requests_ip_rotator import ApiGateway as _ApiGateway
+from requests_ip_rotator.profiles import PROFILES as _PROFILES
+
+
+TEST_SITE = 'https://www.example.com'
+TEST_REGIONS = ["us-east-1", "us-east-2", "us-west-1", "us-west-2", "eu-west-1"]
+LOG_LEVEL = "info"
+
+
+class StandInClient:
+    ''' Local stand-in for the apigateway and apigatewayv2 clients.
+
+    Every call is counted and sleeps `latency` seconds. Only the APIs and usage
+    plans are kept, so that shutdown finds and deletes what start created.
+    '''
+
+    apis = _collections.defaultdict(dict)
+    plans = _collections.defaultdict(dict)
+    calls = _collections.Counter()
+    ids = _itertools.count()
+    lock = _threading.Lock()
+    latency = 0.0
+
+    def __init__(self, region, service):
+        self.region = region
+        self.service = service
+
+    def get_paginator(self, operation):
+        client = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                client._call(operation)
+                items = client.plans if operation == 'get_usage_plans' else client.apis
+                items = list(items[(client.service, client.region)].values())
+                yield {'items': items, 'Items': items}
+        return Paginator()
+
+    def __getattr__(self, operation):
+        def call(**kwargs):
+            self._call(operation)
+            return self._apply(operation, kwargs)
+        return call
+
+    def _call(self, name):
+        with self.lock:
+            self.calls[name] += 1
+        _time.sleep(self.latency)
+
+    def _apply(self, operation, kwargs):
+        key = (self.service, self.region)
+        new_id = f"{next(self.ids):010d}"
+        if operation in ('import_rest_api', 'import_api'):
+            name = _json.loads(kwargs.get('body') or kwargs.get('Body'))['info']['title']
+            now = _datetime.datetime.now(_datetime.timezone.utc)
+            self.apis[key][new_id] = {
+                'id': new_id, 'ApiId': new_id, 'name': name, 'Name': name,
+                'createdDate': now, 'CreatedDate': now, 'ProtocolType': 'HTTP',
+                'apiKeySource': 'HEADER', 'endpointConfiguration': {'types': ['REGIONAL']},
+            }
+        elif operation == 'create_usage_plan':
+            self.plans[key][new_id] = {'id': new_id, 'name': kwargs['name'], 'description': kwargs['description'], 'apiStages': kwargs['apiStages']}
+        elif operation in ('delete_rest_api', 'delete_api'):
+            return self.apis[key].pop(kwargs.get('restApiId') or kwargs.get('ApiId'))
+        elif operation == 'delete_usage_plan':
+            return self.plans[key].pop(kwargs['usagePlanId'])
+        return {'id': new_id, 'ApiId': new_id}
+
+
+class StandInAWS:
+
+    def __init__(self, region, access_id, access_secret, log_level, service="apigateway"):
+        self.region = region
+        self.service = service
+        self.client = StandInClient(region, service)
+
+
+def run(profile: str, count: int) -> dict:
+    StandInClient.calls.clear()
+    gateway = _ApiGateway(TEST_SITE, regions=TEST_REGIONS, profile=profile, log_level="warning")
+
+    started = _time.perf_counter()
+    gateway.start(count=count)
+    start_seconds = _time.perf_counter() - started
+    start_calls = sum(StandInClient.calls.values())
+
+    started = _time.perf_counter()
+    gateway.shutdown()
+    shutdown_seconds = _time.perf_counter() - started
+
+    return {
+        'profile': profile,
+        'start_calls': start_calls,
+        'shutdown_calls': sum(StandInClient.calls.values()) - start_calls,
+        'start_seconds': start_seconds,
+        'shutdown_seconds': shutdown_seconds,
+    }
+
+
+def main() -> None:
+    parser = _argparse.ArgumentParser(description="Compare provisioning profiles against a local stand-in for API Gateway.")
+    parser.add_argument('--latency', type=float, default=0.05, help="simulated seconds per control-plane call")
+    parser.add_argument('--count', type=int, default=1, help="APIs per region")
+    args = parser.parse_args()
+
+    # Swap the AWS clients for the stand-in
+    StandInClient.latency = args.latency
+    _gateway.AWS = StandInAWS
+
+    _log.info(f"{len(TEST_REGIONS)} regions, {args.count} API(s) per region, {args.latency * 1000:.0f}ms per call")
+    _log.info(f"{'profile':<10} {'start calls':>12} {'start (s)':>10} {'shutdown calls':>15} {'shutdown (s)':>13}")
+    for profile in _PROFILES:
+        result = run(profile, args.count)
+        _log.info(
+            f"{result['profile']:<10} {result['start_calls']:>12} {result['start_seconds']:>10.2f}"
+            f" {result['shutdown_calls']:>15} {result['shutdown_seconds']:>13.2f}"
+        )
+
+if __name__ == '__main__':
+
+    ### Enable Logging
+    _logging.basicConfig(
+        format = '%(message)s',
+    )
+    _log = _logging.getLogger(__name__)
+    _log.setLevel(LOG_LEVEL.upper())
+
+    ### Run main
+    main()
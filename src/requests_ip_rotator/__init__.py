@@ -1,3 +1,4 @@
 from ._version import version as __version__
 from .aws import AWS
-from .gateway import ApiGateway
\ No newline at end of file
+from .gateway import ApiGateway
+from .logger import enable_json_output
\ No newline at end of file
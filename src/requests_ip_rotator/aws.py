@@ -1,5 +1,6 @@
 
 import boto3
+import botocore.config
 import botocore.exceptions
 
 from .errors import ApiConnectionError
@@ -8,21 +9,36 @@ from .logger import Logger
 __all__ = ['AWS']
 
 
+# Let botocore pace control-plane calls: API Gateway answers bursts with
+# TooManyRequestsException, which adaptive mode retries with a client-side rate limiter
+CLIENT_CONFIG = botocore.config.Config(
+    retries={
+        'max_attempts': 10,
+        'mode': 'adaptive',
+    }
+)
+
+# Shared by every client, so creating one neither adds a logger nor changes the level of the others
+_logger = Logger('aws-services')
+
+
 class AWS:
 
-    def __init__(self, region: str, access_id: str, access_secret: str, log_level: str):
+    def __init__(self, region: str, access_id: str, access_secret: str, log_level: str, service: str = "apigateway"):
         self.region = region
-        self._logger = Logger('aws-services')
-        self._logger.set_level(log_level.upper())
-       
+        self.service = service
+        # `log_level` is kept for compatibility, the level is set once on the module's logger
+        self._logger = _logger
+
         session = boto3.session.Session()
         try:
             self.client = session.client(
-                "apigateway",
+                service,
                 region_name=region,
                 aws_access_key_id=access_id,
                 aws_secret_access_key=access_secret,
+                config=CLIENT_CONFIG,
             )
-            self._logger.debug(f"Successfully authenticated to AWS region: '{region}'")
-        except botocore.exceptions as err:
-            raise ApiConnectionError(err)
\ No newline at end of file
+            self._logger.debug("Successfully authenticated to AWS region: '%s'", region, region=region)
+        except botocore.exceptions.BotoCoreError as err:
+            raise ApiConnectionError(err)
@@ -1,10 +1,13 @@
 import requests as rq
 import logging
 import concurrent.futures
+import copy
+import re
 import string
+import threading
 from random import choice, choices
 from urllib.parse import urlparse
-from time import sleep
+from time import perf_counter, sleep
 
 import botocore.exceptions
 
@@ -15,17 +18,33 @@ from .models import (
     Connection,
     Endpoint,
     Plan,
+    Reconciliation,
+    RegionShutdown,
+    ShutdownResult,
+)
+from .profiles import (
+    HTTP,
+    PROFILES,
+    REST,
+    SERVICES,
 )
 from .regions import (
     DEFAULT_REGIONS,
     EXTRA_REGIONS,
     ALL_REGIONS,
 )
+from .templates import template_body
 
 
 __all__ = ['ApiGateway']
 
 
+API_PREFIX = "requests_ip_rotator_api"
+USAGE_PLAN_PREFIX = "requests_ip_rotator_usage"
+STAGE_NAME = "ProxyStage"
+HTTP_STAGE_NAME = "$default"
+
+
 # Inherits from HTTPAdapter so that we can edit each request before sending
 class ApiGateway(rq.adapters.HTTPAdapter):
 
@@ -35,6 +54,11 @@ class ApiGateway(rq.adapters.HTTPAdapter):
         access_key_id: str = None,
         access_key_secret: str = None,
         log_level: str = "info",
+        max_workers: int = 10,
+        stages: int = 1,
+        log_sample_rate: float = 0.0,
+        profile: str = REST,
+        adopt_existing: bool = False,
     ):
         super().__init__()
         # Define class attributes
@@ -43,50 +67,89 @@ class ApiGateway(rq.adapters.HTTPAdapter):
 
 
         site_loc = f"{urlparse(site).netloc}{urlparse(site).path}"
-        self.api_name = "requests_ip_rotator_api-{i}-{s}".format(i=''.join(choices(string.ascii_lowercase, k=8)), s=site_loc)
-        self.usage_plan_name = "requests_ip_rotator_usage-{i}-{s}".format(i=''.join(choices(string.ascii_lowercase, k=8)), s=site_loc)
+        self.api_name = "{p}-{i}-{s}".format(p=API_PREFIX, i=''.join(choices(string.ascii_lowercase, k=8)), s=site_loc)
+        self.usage_plan_name = "{p}-{i}-{s}".format(p=USAGE_PLAN_PREFIX, i=''.join(choices(string.ascii_lowercase, k=8)), s=site_loc)
         self.regions = regions
         self.log_level = log_level
+        self.log_sample_rate = log_sample_rate
+        self.max_workers = max_workers
+        self.adopt_existing = adopt_existing
+
+        if profile not in PROFILES:
+            raise ValueError(f"Invalid provisioning profile: '{profile}', expected one of {PROFILES}")
+        self.profile = profile
+        self._service = SERVICES[profile]
+
+        # Each API is deployed to one stage, plus any extras requested
+        self.stage_names = [STAGE_NAME] + [f"{STAGE_NAME}{i}" for i in range(2, stages + 1)]
+
+        # Matches APIs provisioned for this site by any ApiGateway instance
+        self._site_api_pattern = re.compile(
+            "{p}-[a-z]{{8}}-{s}".format(p=API_PREFIX, s=re.escape(site_loc))
+        )
 
         # Setup logger
         self._logger = Logger(f"aws-api-gateway for regions: '{self.regions}'")
         self._logger.set_level(self.log_level.upper())
 
+        # HTTP APIs serve from a single auto-deployed stage without a path prefix
+        if self.profile == HTTP:
+            if stages > 1:
+                self._logger.warning("Extra stages are not supported by the '%s' profile, using one stage per API.", HTTP)
+            self.stage_names = [HTTP_STAGE_NAME]
+
         # Set simple params from constructor
         if site.endswith("/"):
             self.site = site[:-1]
         else:
             self.site = site
 
+        # APIs shutdown deletes: the ones this instance created, and the ones it adopted
+        self._owned_ids = set()
 
-    def _existing_connection(self, aws: AWS) -> Connection:
-        """ Returns existing endpoint"""
+        # Hostnames in use, and the stage of each API requests are spread across
+        self.endpoints = []
+        self._targets = []
 
-        try:
-            current_apis = aws.client.get_rest_apis().get('items')
-        except botocore.exceptions.ClientError as e:
-            if e.response.get('Error').get('Code') == "UnrecognizedClientException":
-                self._logger.error(f"Could not create region (some regions require manual enabling): {region}")
-                return Connection(success=False)
-            raise ApiConnectionError(e)
+        # Tracks requests in flight so shutdown can drain them
+        self._in_flight = 0
+        self._draining = False
+        self._drain_condition = threading.Condition()
 
-        if len(current_apis) == 0:
-            return Connection()
-        for api in current_apis:
-            if self.api_name == api.get('name'):
-                return Connection(
-                    success = True,
-                    endpoint = f"{api.get('id')}.execute-api.{aws.region}.amazonaws.com",
-                    new = False,
-                )
-    def _active_endpoints(self, aws: AWS, limit=500) -> list:
+    def __enter__(self):
+        if not self.endpoints:
+            try:
+                self.start()
+            except BaseException:
+                # Remove whatever was created before the failure
+                self.shutdown()
+                raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+
+    def _is_site_api(self, name: str) -> bool:
+        """ Returns whether an API name belongs to this site"""
+        return name == self.api_name or self._site_api_pattern.fullmatch(name) is not None
+
+    def _active_endpoints(self, aws: AWS, limit=500, strict=False) -> list:
         """ Returns existing endpoint"""
 
+        if self.profile == HTTP:
+            return self._active_http_endpoints(aws, limit, strict)
+
         try:
-            current_apis = aws.client.get_rest_apis(limit=limit).get('items')
+            current_apis = []
+            for page in aws.client.get_paginator('get_rest_apis').paginate(PaginationConfig={'PageSize': limit}):
+                current_apis.extend(page.get('items', []))
         except botocore.exceptions.ClientError as e:
+            if strict:
+                raise
             if e.response.get('Error').get('Code') == "UnrecognizedClientException":
-                return self._logger.error(f"Could not create region (some regions require manual enabling): {region}")
+                self._logger.error("Could not create region (some regions require manual enabling): %s", aws.region, region=aws.region)
+                return []
             raise ApiConnectionError(e)
         endpoints = []
         for api in current_apis:
@@ -101,14 +164,50 @@ class ApiGateway(rq.adapters.HTTPAdapter):
             endpoints.append(endpoint)
         return endpoints
 
+    def _active_http_endpoints(self, aws: AWS, limit=500, strict=False) -> list:
+        """ Returns existing HTTP API endpoints"""
+
+        try:
+            current_apis = []
+            for page in aws.client.get_paginator('get_apis').paginate(PaginationConfig={'PageSize': limit}):
+                current_apis.extend(page.get('Items', []))
+        except botocore.exceptions.ClientError as e:
+            if strict:
+                raise
+            if e.response.get('Error').get('Code') == "UnrecognizedClientException":
+                self._logger.error("Could not create region (some regions require manual enabling): %s", aws.region, region=aws.region)
+                return []
+            raise ApiConnectionError(e)
+        endpoints = []
+        for api in current_apis:
+            if api.get('ProtocolType') != "HTTP":
+                continue
+            endpoint = Endpoint(
+                identity = api.get('ApiId'),
+                name = api.get('Name'),
+                created_date = api.get('CreatedDate'),
+                key_source = api.get('ApiKeySelectionExpression', ''),
+                config = {'types': ['REGIONAL']},
+                url = f"{api.get('ApiId')}.execute-api.{aws.region}.amazonaws.com",
+            )
+            endpoints.append(endpoint)
+        return endpoints
+
     def _active_usage_plans(self, aws: AWS, limit=500) -> list:
         """ Returns existing endpoint"""
 
+        # HTTP APIs have no usage plans
+        if self.profile == HTTP:
+            return []
+
         try:
-            current_usage_plans = aws.client.get_usage_plans(limit=limit).get('items')
+            current_usage_plans = []
+            for page in aws.client.get_paginator('get_usage_plans').paginate(PaginationConfig={'PageSize': limit}):
+                current_usage_plans.extend(page.get('items', []))
         except botocore.exceptions.ClientError as e:
             if e.response.get('Error').get('Code') == "UnrecognizedClientException":
-                return self._logger.error(f"Could not create region (some regions require manual enabling): {region}")
+                self._logger.error("Could not create region (some regions require manual enabling): %s", aws.region, region=aws.region)
+                return []
             raise ApiConnectionError(e)
         usage_plans = []
         for usg_pln in current_usage_plans:
@@ -122,187 +221,297 @@ class ApiGateway(rq.adapters.HTTPAdapter):
         return usage_plans
         
 
-    def _init_gateway(self, region: str, force: bool = False) -> dict:
-        # Connect to AWS
-        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level())
-
-        # If API gateway already exists for host, return pre-existing endpoint
-        current_endpoints = self._existing_connection(aws)
-        if not force and current_endpoints is None:
-            raise ApiConnectionError('No endpoints found')
-        if not force and current_endpoints.success:
-            return self._existing_connection(aws)
-
-        # Create simple rest API resource
-        create_api_response = aws.client.create_rest_api(
-            name=self.api_name,
-            endpointConfiguration={
-                "types": [
-                    "REGIONAL",
-                ]
-            }
-        )
-
-        # Get ID for new resource
-        get_resource_response = aws.client.get_resources(
-            restApiId=create_api_response.get('id')
-        )
-        rest_api_id = create_api_response.get('id')
+    def _connections(self, region: str, url: str, new: bool, stages: list = None) -> list:
+        """ Returns one connection per stage of an API"""
+        return [
+            Connection(
+                success = True,
+                endpoint = url,
+                new = new,
+                region = region,
+                stage = stage,
+            )
+            for stage in (stages or self.stage_names)
+        ]
+
+    @property
+    def connections(self) -> list:
+        """ Returns the connection of every API stage in use, with its region, for selection strategies"""
+        return [copy.copy(connection) for connection in self._targets]
+
+    def _use(self, connections: list) -> list:
+        """ Routes requests through the given connections, returning their hostnames"""
+        self._targets = connections
+        self.endpoints = list(dict.fromkeys(connection.endpoint for connection in connections))
+        return self.endpoints
 
-        # Create "Resource" (wildcard proxy path)
-        create_resource_response = aws.client.create_resource(
-            restApiId=create_api_response.get('id'),
-            parentId=get_resource_response.get('items')[0].get('id'),
-            pathPart="{proxy+}"
+    def _create_gateway(self, aws: AWS) -> list:
+        if self.profile == HTTP:
+            return self._create_http_gateway(aws)
+
+        # Create the rest API, its {proxy+} resource and integrations from the site template
+        import_api_response = aws.client.import_rest_api(
+            body=template_body(self.site, self.api_name),
+            parameters={
+                "endpointConfigurationTypes": "REGIONAL"
+            },
+            failOnWarnings=True
         )
+        rest_api_id = import_api_response.get('id')
+        # Owned from here on, so shutdown removes it even if a later step fails
+        self._owned_ids.add(rest_api_id)
 
-        # Allow all methods to new resource
-        aws.client.put_method(
-            restApiId=create_api_response.get('id'),
-            resourceId=get_resource_response.get('items')[0].get('id'),
-            httpMethod="ANY",
-            authorizationType="NONE",
-            requestParameters={
-                "method.request.path.proxy": True,
-                "method.request.header.X-My-X-Forwarded-For": True
-            }
+        # Creates deployment resource, so that our API to be callable
+        create_deployment_response = aws.client.create_deployment(
+            restApiId=rest_api_id,
+            stageName=STAGE_NAME
         )
 
-        # Make new resource route traffic to new host
-        aws.client.put_integration(
-            restApiId=create_api_response.get('id'),
-            resourceId=get_resource_response.get('items')[0].get('id'),
-            type="HTTP_PROXY",
-            httpMethod="ANY",
-            integrationHttpMethod="ANY",
-            uri=self.site,
-            connectionType="INTERNET",
-            requestParameters={
-                "integration.request.path.proxy": "method.request.path.proxy",
-                "integration.request.header.X-Forwarded-For": "method.request.header.X-My-X-Forwarded-For"
-            }
-        )
+        # Expose the same deployment under any extra stages
+        for stage in self.stage_names[1:]:
+            aws.client.create_stage(
+                restApiId=rest_api_id,
+                stageName=stage,
+                deploymentId=create_deployment_response.get('id')
+            )
 
-        aws.client.put_method(
-            restApiId=create_api_response.get('id'),
-            resourceId=create_resource_response.get('id'),
-            httpMethod="ANY",
-            authorizationType="NONE",
-            requestParameters={
-                "method.request.path.proxy": True,
-                "method.request.header.X-My-X-Forwarded-For": True
-            }
-        )
+        # Create simple usage plan
+        if self.profile == REST:
+            aws.client.create_usage_plan(
+                name=self.usage_plan_name,
+                description=rest_api_id,
+                apiStages=[
+                    {
+                        "apiId": rest_api_id,
+                        "stage": stage
+                    }
+                    for stage in self.stage_names
+                ]
+            )
 
-        aws.client.put_integration(
-            restApiId=create_api_response.get('id'),
-            resourceId=create_resource_response.get('id'),
-            type="HTTP_PROXY",
-            httpMethod="ANY",
-            integrationHttpMethod="ANY",
-            uri=f"{self.site}/{{proxy}}",
-            connectionType="INTERNET",
-            requestParameters={
-                "integration.request.path.proxy": "method.request.path.proxy",
-                "integration.request.header.X-Forwarded-For": "method.request.header.X-My-X-Forwarded-For"
-            }
-        )
+        # Return endpoint name and whether it show it is newly created
+        return self._connections(aws.region, f"{rest_api_id}.execute-api.{aws.region}.amazonaws.com", new=True)
 
-        # Creates deployment resource, so that our API to be callable
-        aws.client.create_deployment(
-            restApiId=rest_api_id,
-            stageName="ProxyStage"
+    def _create_http_gateway(self, aws: AWS) -> list:
+        # Create the HTTP API, its $default route and integration from the site template
+        import_api_response = aws.client.import_api(
+            Body=template_body(self.site, self.api_name, self._service).decode(),
+            FailOnWarnings=True
         )
-
-        # Create simple usage plan
-        aws.client.create_usage_plan(
-            name=self.usage_plan_name,
-            description=rest_api_id,
-            apiStages=[
-                {
-                    "apiId": rest_api_id,
-                    "stage": "ProxyStage"
-                }
-            ]
+        api_id = import_api_response.get('ApiId')
+        # Owned from here on, so shutdown removes it even if a later step fails
+        self._owned_ids.add(api_id)
+
+        # Serve the API from an auto-deployed stage without a path prefix
+        aws.client.create_stage(
+            ApiId=api_id,
+            StageName=HTTP_STAGE_NAME,
+            AutoDeploy=True
         )
 
         # Return endpoint name and whether it show it is newly created
-        return Connection(
-            success = True,
-            endpoint = f"{rest_api_id}.execute-api.{region}.amazonaws.com",
-            new = False,
-        )
+        return self._connections(aws.region, f"{api_id}.execute-api.{aws.region}.amazonaws.com", new=True)
+
+    def _create_stages(self, aws: AWS, ep: Endpoint, stages: list, deployment_id: str) -> None:
+        """ Adds missing stages to an existing API, on its current deployment"""
+        for stage in stages:
+            self._logger.debug("Adding stage '%s' to API '%s'", stage, ep.identity, region=aws.region, endpoint=ep.url)
+            aws.client.create_stage(
+                restApiId=ep.identity,
+                stageName=stage,
+                deploymentId=deployment_id
+            )
+
+        # Attach the new stages to the API's usage plan
+        if self.profile == REST:
+            for usg_pln in self._active_usage_plans(aws):
+                if usg_pln.description == ep.identity:
+                    aws.client.update_usage_plan(
+                        usagePlanId=usg_pln.identity,
+                        patchOperations=[
+                            {
+                                "op": "add",
+                                "path": "/apiStages",
+                                "value": f"{ep.identity}:{stage}"
+                            }
+                            for stage in stages
+                        ]
+                    )
+
+
+    def _request_delete(self, aws: AWS, identity: str) -> dict:
+        if self.profile == HTTP:
+            return aws.client.delete_api(ApiId=identity)
+        return aws.client.delete_rest_api(restApiId=identity)
+
+    def _delete_api(self, aws: AWS, ep: Endpoint) -> bool:
+        self._logger.debug("Removing endpoint '%s' named as '%s' created on '%s'", ep.identity, ep.name, ep.created_date, region=aws.region, endpoint=ep.url)
+
+        # Attempt delete, throttling is retried by the client
+        try:
+            success = self._request_delete(aws, ep.identity)
+        except botocore.exceptions.ClientError as e:
+            self._logger.error("Failed to delete API %s: %s", ep.identity, e.response.get('Error').get('Message'), region=aws.region, endpoint=ep.url)
+            return False
+        if success:
+            self._logger.debug("Removed API '%s'", ep.identity, region=aws.region, endpoint=ep.url)
+            return True
+        self._logger.error("Failed to delete API %s.", ep.identity, region=aws.region, endpoint=ep.url)
+        return False
+
+    def _delete_usage_plan(self, aws: AWS, usg_pln: Plan) -> bool:
+        self._logger.debug("Removing plan '%s' named as '%s'", usg_pln.identity, usg_pln.name, region=aws.region)
+
+        # Attempt delete, throttling is retried by the client
+        try:
+            success = aws.client.delete_usage_plan(usagePlanId=usg_pln.identity)
+        except botocore.exceptions.ClientError as e:
+            self._logger.error("Failed to delete Plan %s: %s", usg_pln.identity, e.response.get('Error').get('Message'), region=aws.region)
+            return False
+        if success:
+            self._logger.debug("Removed Plan '%s'", usg_pln.identity, region=aws.region)
+            return True
+        self._logger.error("Failed to delete Plan %s.", usg_pln.identity, region=aws.region)
+        return False
+
+    def _delete_apis(self, aws: AWS, endpoints: list) -> tuple:
+        """ Deletes the given APIs along with the usage plans attached to them"""
+
+        deleted_ids = set()
+        for ep in endpoints:
+            if self._delete_api(aws, ep):
+                deleted_ids.add(ep.identity)
+        self._owned_ids.difference_update(deleted_ids)
+
+        # Only the rest profile creates usage plans
+        deleted_plans = 0
+        if deleted_ids and self.profile == REST:
+            for usg_pln in self._active_usage_plans(aws):
+                # Usage plans carry the id of the API they were created for
+                if usg_pln.description in deleted_ids:
+                    if self._delete_usage_plan(aws, usg_pln):
+                        deleted_plans += 1
 
+        return len(deleted_ids), deleted_plans
 
-    def _delete_gateway(self, region: str) -> int:
+    def _delete_gateway(self, region: str) -> tuple:
         # Connect to AWS
-        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level())
+        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level(), self._service)
 
-        # Get all gateway apis (or skip if we don't have permission)
-        endpoints = self._active_endpoints(aws)
-        usage_plans = self._active_usage_plans(aws)
-        deleted_endpoints = 0
-        for ep in endpoints:
-            # Check if hostname matches
-            if self.api_name == ep.name:
-                date_format = '%Y/%m/%d %H:%M:%S %z'
-                self._logger.debug("Removing endpoint '{identity}' named as '{name}' created on '{date}'".format(identity=ep.identity, name=ep.name, date=ep.created_date.strftime(date_format)))
-                
-                # Attempt delete
-                try:
-                    success = aws.client.delete_rest_api(restApiId=ep.identity)
-                    if success:
-                        deleted_endpoints += 1
-                        self._logger.debug(f"Removed API '{ep.identity}'")
-                    else:
-                        self._logger.error(f"Failed to delete API {ep.identity}.")
-                except botocore.exceptions.ClientError as e:
-                    # If timeout, retry
-                    err_code = e.response.get('Error').get('Code')
-                    if err_code == "TooManyRequestsException":
-                        sleep(1)
-                        continue
-                    else:
-                        self._logger.error(f"Failed to delete API {ep.identity}.")
-       
-        deleted_plans = 0
-        for usg_pln in usage_plans:
-            # Check if usage plan matches
-            if self.usage_plan_name == usg_pln.name:
-                date_format = '%Y/%m/%d %H:%M:%S %z'
-                self._logger.debug("Removing plan '{identity}' named as '{name}'".format(identity=usg_pln.identity, name=usg_pln.name))
+        # Only delete APIs this gateway owns, other instances may still be using theirs
+        endpoints = [ep for ep in self._active_endpoints(aws) if ep.identity in self._owned_ids]
+        return self._delete_apis(aws, endpoints)
+
+    def _plan_region(self, region: str, count: int, force: bool = False, prune: bool = True, adopt: bool = True) -> tuple:
+        """ Compares the APIs deployed for this site in a region against the desired count.
+
+        With `adopt`, every API of the site counts, otherwise only the ones this instance owns.
+        """
+
+        # Connect to AWS
+        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level(), self._service)
+        if force:
+            return aws, Reconciliation(region=region, create=count)
 
-                # Attempt delete
+        try:
+            current_apis = self._active_endpoints(aws, strict=True)
+        except botocore.exceptions.ClientError as e:
+            if e.response.get('Error').get('Code') == "UnrecognizedClientException":
+                self._logger.error("Could not create region (some regions require manual enabling): %s", region, region=region)
+                return aws, Reconciliation(region=region, available=False)
+            raise ApiConnectionError(e)
+
+        # Keep the oldest APIs so endpoints handed out earlier stay valid
+        current = sorted(
+            (ep for ep in current_apis if self._is_site_api(ep.name) and (adopt or ep.identity in self._owned_ids)),
+            key=lambda ep: ep.created_date,
+        )
+        plan = Reconciliation(region=region)
+        for ep in current:
+            if len(plan.keep) == count:
+                break
+            deployed = self._deployed_stages(aws, ep)
+            # An API left without its first stage by a failed create serves nothing, replace it
+            if self.stage_names[0] not in deployed:
+                self._logger.warning("API '%s' has no '%s' stage, replacing it", ep.identity, self.stage_names[0], region=region, endpoint=ep.url)
+                continue
+            plan.keep.append(ep)
+            missing = [stage for stage in self.stage_names if stage not in deployed]
+            if missing:
+                plan.missing_stages[ep.identity] = missing
+                plan.deployments[ep.identity] = deployed[self.stage_names[0]]
+
+        plan.create = count - len(plan.keep)
+        if prune:
+            kept = {ep.identity for ep in plan.keep}
+            plan.delete = [ep for ep in current if ep.identity not in kept]
+        return aws, plan
+
+    def _deployed_stages(self, aws: AWS, ep: Endpoint) -> dict:
+        """ Returns the deployment id of each stage of an API"""
+        if self.profile == HTTP:
+            items = aws.client.get_stages(ApiId=ep.identity).get('Items', [])
+            return {stage.get('StageName'): stage.get('DeploymentId') for stage in items}
+        items = aws.client.get_stages(restApiId=ep.identity).get('item', [])
+        return {stage.get('stageName'): stage.get('deploymentId') for stage in items}
+
+    def _plan(self, count: int, force: bool = False, prune: bool = True, adopt: bool = True) -> list:
+        """ Plans every region concurrently, returning (client, plan) pairs"""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._plan_region, region=region, count=count, force=force, prune=prune, adopt=adopt)
+                for region in self.regions
+            ]
+            return [future.result() for future in concurrent.futures.as_completed(futures)]
+
+    def _provision(self, plans: list) -> list:
+        """ Applies region plans concurrently, returning the connections serving the site"""
+
+        connections = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = []
+            for aws, plan in plans:
+                for ep in plan.keep:
+                    connections.extend(self._connections(plan.region, ep.url, new=False))
+                    # Adopted APIs are taken over, shutdown deletes them too
+                    if self.adopt_existing:
+                        self._owned_ids.add(ep.identity)
+                if plan.delete:
+                    futures.append(executor.submit(self._delete_apis, aws=aws, endpoints=plan.delete))
+                for ep in plan.keep:
+                    if ep.identity in plan.missing_stages:
+                        futures.append(executor.submit(
+                            self._create_stages, aws=aws, ep=ep,
+                            stages=plan.missing_stages[ep.identity],
+                            deployment_id=plan.deployments[ep.identity],
+                        ))
+                # Each new API is provisioned on its own thread
+                for _ in range(plan.create):
+                    futures.append(executor.submit(self._create_gateway, aws=aws))
+            errors = []
+            for future in concurrent.futures.as_completed(futures):
                 try:
-                    success = aws.client.delete_usage_plan(usagePlanId=usg_pln.identity)
-                    if success:
-                        deleted_plans += 1
-                        self._logger.debug(f"Removed Plan '{usg_pln.identity}'")
-                    else:
-                        self._logger.error(f"Failed to delete Plan {usg_pln.identity}.")
-                except botocore.exceptions.ClientError as e:
-                    # If timeout, retry
-                    err_code = e.response.get('Error').get('Code')
-                    err_msg = e.response.get('Error').get('Message')
-                    if err_code == "TooManyRequestsException":
-                        sleep(1)
-                        continue
-                    if err_code == "BadRequestException":
-                        self._logger.error(err_msg)
-                    else:
-                        self._logger.error(f"Failed to delete Plan {usg_pln.identity}.")
-        
-        return deleted_endpoints, deleted_plans
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if isinstance(result, list):
+                    connections.extend(result)
+
+        # Keep what was provisioned, so it is used and cleaned up like the rest
+        if errors:
+            self._use(connections)
+            raise errors[0]
+        return connections
 
 
     def _current_gateways(self, region: str) -> dict:
         # Connect to AWS
-        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level())
+        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level(), self._service)
         
         usage_plans = {}
         for usg_pln in self._active_usage_plans(aws):
-            date_format = '%Y/%m/%d %H:%M:%S %z'
-            self._logger.debug("plan '{idn}' named as '{name}' is active".format(idn=usg_pln.identity, name=usg_pln.name))
+            self._logger.debug("plan '%s' named as '%s' is active", usg_pln.identity, usg_pln.name, region=region)
             usage_plans[usg_pln.identity] = {
                 'name': usg_pln.name,
                 'description': usg_pln.description,
@@ -310,8 +519,7 @@ class ApiGateway(rq.adapters.HTTPAdapter):
 
         endpoints = {}
         for ep in self._active_endpoints(aws):
-            date_format = '%Y/%m/%d %H:%M:%S %z'
-            self._logger.debug("Endpoint '{name}' located at '{url}' created on '{date}' is active".format(name=ep.name, url=ep.url, date=ep.created_date.strftime(date_format)))
+            self._logger.debug("Endpoint '%s' located at '%s' created on '%s' is active", ep.name, ep.url, ep.created_date, region=region, endpoint=ep.url)
             endpoints[ep.identity] = {
                 'name': ep.name,
                 'creation_date': ep.created_date,
@@ -322,23 +530,22 @@ class ApiGateway(rq.adapters.HTTPAdapter):
 
     def _remove_all_gateways(self, region: str) -> dict:
         # Connect to AWS
-        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level())
+        aws = AWS(region, self.access_key_id, self.access_key_secret, self._logger.get_level(), self._service)
         
         endpoints = self._active_endpoints(aws)
         usage_plans = self._active_usage_plans(aws)
         deleted_endpoints = 0
         for ep in endpoints:
-            date_format = '%Y/%m/%d %H:%M:%S %z'
-            self._logger.debug("Removing endpoint '{identity}' created on '{date}'".format(identity=ep.identity, date=ep.created_date.strftime(date_format)))
+            self._logger.debug("Removing endpoint '%s' created on '%s'", ep.identity, ep.created_date, region=region, endpoint=ep.url)
             
             # Attempt delete
             try:
-                success = aws.client.delete_rest_api(restApiId=ep.identity)
+                success = self._request_delete(aws, ep.identity)
                 if success:
                     deleted_endpoints += 1
-                    self._logger.debug(f"Removed API({deleted_endpoints}/{len(endpoints)}) '{ep.identity}'")
+                    self._logger.debug("Removed API(%d/%d) '%s'", deleted_endpoints, len(endpoints), ep.identity, region=region, endpoint=ep.url)
                 else:
-                    self._logger.error(f"Failed to delete API {ep.identity}.")
+                    self._logger.error("Failed to delete API %s.", ep.identity, region=region, endpoint=ep.url)
             except botocore.exceptions.ClientError as e:
                 # If timeout, retry
                 err_code = e.response.get('Error').get('Code')
@@ -346,21 +553,20 @@ class ApiGateway(rq.adapters.HTTPAdapter):
                     sleep(1)
                     continue
                 else:
-                    self._logger.error(f"Failed to delete API {ep.identity}.")
+                    self._logger.error("Failed to delete API %s.", ep.identity, region=region, endpoint=ep.url)
 
         deleted_plans = 0
         for usg_pln in usage_plans:
-            date_format = '%Y/%m/%d %H:%M:%S %z'
-            self._logger.debug("Removing plan '{identity}' named as '{name}'".format(identity=usg_pln.identity, name=usg_pln.name))
+            self._logger.debug("Removing plan '%s' named as '%s'", usg_pln.identity, usg_pln.name, region=region)
             
             # Attempt delete
             try:
                 success = aws.client.delete_usage_plan(usagePlanId=usg_pln.identity)
                 if success:
                     deleted_plans += 1
-                    self._logger.debug(f"Removed Plan({deleted_plans}/{len(usage_plans)}) '{usg_pln.identity}'")
+                    self._logger.debug("Removed Plan(%d/%d) '%s'", deleted_plans, len(usage_plans), usg_pln.identity, region=region)
                 else:
-                    self._logger.error(f"Failed to delete Plan {usg_pln.identity}.")
+                    self._logger.error("Failed to delete Plan %s.", usg_pln.identity, region=region)
             except botocore.exceptions.ClientError as e:
                 # If timeout, retry
                 err_code = e.response.get('Error').get('Code')
@@ -368,7 +574,7 @@ class ApiGateway(rq.adapters.HTTPAdapter):
                     sleep(1)
                     continue
                 else:
-                    self._logger.error(f"Failed to delete Plan {usg_pln.identity}.")
+                    self._logger.error("Failed to delete Plan %s.", usg_pln.identity, region=region)
         return deleted_endpoints, deleted_plans
 
     def send(self, request: rq.models.Response, stream: bool = False, timeout: int = None,
@@ -376,72 +582,161 @@ class ApiGateway(rq.adapters.HTTPAdapter):
         cert: tuple = None,
         proxies: dict = None,
         ) -> rq.models.Response:
+        # Stop handing out endpoints once shutdown has begun
+        with self._drain_condition:
+            if self._draining:
+                raise ApiConnectionError('Gateway is shutting down, no endpoints are available')
+            self._in_flight += 1
+        try:
+            return self._send(request, stream, timeout, verify, cert, proxies)
+        finally:
+            with self._drain_condition:
+                self._in_flight -= 1
+                if self._in_flight == 0:
+                    self._drain_condition.notify_all()
+
+    def _send(self, request: rq.models.Response, stream: bool, timeout: int, verify: bool, cert: tuple, proxies: dict) -> rq.models.Response:
         # Get random endpoint
         try:
-            endpoint = choice(self.endpoints)
-        except AttributeError:
+            connection = choice(self._targets)
+        except IndexError:
             raise ApiConnectionError('No API endpoints detected, has a gateway been started?')
+        endpoint = connection.endpoint
         # Replace URL with our endpoint
         protocol, site = request.url.split("://", 1)
         site_path = site.split("/", 1)[1]
-        request.url = "https://" + endpoint + "/ProxyStage/" + site_path
+        if connection.stage == HTTP_STAGE_NAME:
+            request.url = "https://" + endpoint + "/" + site_path
+        else:
+            request.url = "https://" + endpoint + "/" + connection.stage + "/" + site_path
         # Replace host with endpoint host
         request.headers['Host'] = endpoint
-        # Run original python requests send function
-        return super().send(request, stream, timeout, verify, cert, proxies)
+        # Run original python requests send function, timing only the sampled requests
+        if not self._logger.sampled(self.log_sample_rate):
+            return super().send(request, stream, timeout, verify, cert, proxies)
+        started = perf_counter()
+        response = super().send(request, stream, timeout, verify, cert, proxies)
+        self._logger.debug(
+            "Proxied %s request", request.method,
+            region=connection.region,
+            endpoint=endpoint,
+            stage=connection.stage,
+            status=response.status_code,
+            latency_ms=round((perf_counter() - started) * 1000, 3),
+        )
+        return response
+
+    def start(self, force=False, endpoints=[], count=1) -> list:
+        with self._drain_condition:
+            self._draining = False
 
-    def start(self, force=False, endpoints=[]) -> list:
         # If endpoints given already, assign and continue
         if len(endpoints) > 0:
-            self.endpoints = endpoints
-            return endpoints
+            return self._use([
+                connection
+                for endpoint in endpoints
+                for connection in self._connections(endpoint.split(".")[2], endpoint, new=False)
+            ])
 
         # Otherwise, start/locate new endpoints
         self._logger.info(
-            f"Starting API gateway{'s' if len(self.regions) > 1 else ''} in {len(self.regions)} regions: {', '.join(self.regions)}"
+            "Starting %d API gateway%s per region in %d regions: %s",
+            count, 's' if count > 1 else '', len(self.regions), ', '.join(self.regions)
         )
-        self.endpoints = []
-        new_endpoints = 0
 
-        # Setup multithreading object
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            futures = []
-            # Send each region creation to its own thread
-            for region in self.regions:
-                futures.append(executor.submit(self._init_gateway, region=region, force=force))
-            # Get thread outputs
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                if result.success:
-                    self.endpoints.append(result.endpoint)
-                    if result.new:
-                        new_endpoints += 1
+        # Reuse up to `count` existing APIs per region, without removing any extras
+        plans = self._plan(count, force=force, prune=False, adopt=self.adopt_existing)
+        connections = self._provision(plans)
+        self._use(connections)
+        new_endpoints = len({connection.endpoint for connection in connections if connection.new})
 
-        self._logger.debug(f"Using {len(self.endpoints)} endpoints with name '{self.api_name}' ({new_endpoints} new).")
+        self._logger.debug("Using %d endpoints with name '%s' (%d new).", len(self.endpoints), self.api_name, new_endpoints)
         return self.endpoints
 
-    def shutdown(self):
-        self._logger.info(f"Deleting API gateway{'s' if len(self.regions) > 1 else ''} for site '{self.site}'.")
+    def reconcile(self, count: int = 1, dry_run: bool = False) -> dict:
+        """ Converges the site's gateways to `count` APIs in every region.
+
+        Every API deployed for the site counts, whichever process created it. Only
+        the APIs missing from, or surplus to, the desired state are created or
+        deleted, so calling this on an up-to-date fleet makes no mutating calls.
+        """
+        self._logger.info("Reconciling %d API gateway%s per region in %d regions for site '%s'.", count, 's' if count > 1 else '', len(self.regions), self.site)
+
+        # Inventory every region before changing anything
+        plans = self._plan(count)
+
+        to_create = sum(plan.create for _, plan in plans)
+        to_delete = sum(len(plan.delete) for _, plan in plans)
+        self._logger.debug("Reconcile plan for site '%s': %d to create, %d to delete.", self.site, to_create, to_delete)
+        if dry_run:
+            return {
+                'plans': [plan for _, plan in plans],
+                'created': 0,
+                'deleted': 0,
+                'endpoints': [ep.url for _, plan in plans for ep in plan.keep],
+            }
+
+        self._use(self._provision(plans))
+        self._logger.debug("Using %d endpoints for site '%s' (%d new, %d removed).", len(self.endpoints), self.site, to_create, to_delete)
+        return {
+            'plans': [plan for _, plan in plans],
+            'created': to_create,
+            'deleted': to_delete,
+            'endpoints': self.endpoints,
+        }
+
+    def _shutdown_region(self, region: str) -> RegionShutdown:
+        started = perf_counter()
+        try:
+            deleted_endpoints, deleted_plans = self._delete_gateway(region)
+        except Exception as e:
+            self._logger.error("Failed to delete API gateways in region %s: %s", region, e, region=region)
+            return RegionShutdown(region=region, seconds=perf_counter() - started, error=str(e))
+        return RegionShutdown(
+            region = region,
+            deleted_endpoints = deleted_endpoints,
+            deleted_plans = deleted_plans,
+            seconds = perf_counter() - started,
+        )
+
+    def shutdown(self, timeout: float = 30) -> ShutdownResult:
+        """ Drains in-flight requests for up to `timeout` seconds, then deletes the gateways"""
+        started = perf_counter()
+
+        # Refuse new requests, then wait for the ones already sent
+        with self._drain_condition:
+            self._draining = True
+            drained = self._drain_condition.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+            in_flight = self._in_flight
+        drain_seconds = perf_counter() - started
+        if not drained:
+            self._logger.warning("Deleting API gateways with %d requests still in flight after %.1fs.", in_flight, drain_seconds)
+
+        self._logger.info("Deleting API gateway%s for site '%s'.", 's' if len(self.regions) > 1 else '', self.site)
 
         # Setup multithreading object
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             futures = []
             # Send each region deletion to its own thread
             for region in self.regions:
-                futures.append(executor.submit(self._delete_gateway, region=region))
+                futures.append(executor.submit(self._shutdown_region, region=region))
             # Check outputs
-            deleted_endpoints = 0
-            deleted_plans = 0
-            for future in concurrent.futures.as_completed(futures):
-                endpoints, plans = future.result()
-                deleted_endpoints += endpoints
-                deleted_plans += plans
-                
-        self._logger.debug(f"Deleted {deleted_endpoints} endpoints and {deleted_plans} plans for site '{self.site}'.")
+            regions = [future.result() for future in concurrent.futures.as_completed(futures)]
+        self._use([])
+
+        result = ShutdownResult(
+            drained = drained,
+            in_flight = in_flight,
+            drain_seconds = drain_seconds,
+            seconds = perf_counter() - started,
+            regions = regions,
+        )
+        self._logger.debug("Deleted %d endpoints and %d plans for site '%s'.", result.deleted_endpoints, result.deleted_plans, self.site)
+        return result
 
     def status(self, force=False) -> dict:
-        self._logger.info(f"Getting status of API gateway{'s' if len(self.regions) > 1 else ''} for site '{self.site}'.")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        self._logger.info("Getting status of API gateway%s for site '%s'.", 's' if len(self.regions) > 1 else '', self.site)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             futures = []
             # Send each region creation to its own thread
             for region in self.regions:
@@ -449,16 +744,16 @@ class ApiGateway(rq.adapters.HTTPAdapter):
             # Get thread outputs
             for future in concurrent.futures.as_completed(futures):
                 plans, endpoints = future.result()
-        self._logger.debug(f"total active plans: {len(plans)}")
-        self._logger.debug(f"total active endpoints: {len(endpoints)}")
+        self._logger.debug("total active plans: %d", len(plans))
+        self._logger.debug("total active endpoints: %d", len(endpoints))
         return {
             'active_plans': plans,
             'active_endpoints': endpoints,
         }
 
     def cleanup(self, force=False) -> dict:
-        self._logger.info(f"Removing all API gateway{'s' if len(self.regions) > 1 else ''} endpoints.")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        self._logger.info("Removing all API gateway%s endpoints.", 's' if len(self.regions) > 1 else '')
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             futures = []
             # Send each region creation to its own thread
             for region in self.regions:
@@ -1,14 +1,92 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import pathlib
+import queue
+import random
+import threading
 import traceback
 
-__all__ = ['Logger']
+__all__ = ['Logger', 'JsonFormatter', 'enable_json_output']
+
+
+ROOT_LOGGER = 'requests_ip_rotator'
+LEVELS = ['FATAL', 'CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG']
+
+
+class JsonFormatter(logging.Formatter):
+    """ Renders records as JSON lines, with any structured fields at the top level"""
+
+    def __init__(self, datefmt: str = '%Y-%m-%d %H:%M:%S %z'):
+        super().__init__(datefmt=datefmt)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.process,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """ Enqueues records unformatted, so messages and tracebacks are rendered by the listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+class _QueuedOutput:
+    """ Moves handler I/O off the calling thread: callers only enqueue records"""
+
+    def __init__(self, handler: logging.Handler):
+        self.queue = queue.SimpleQueue()
+        self.handler = _RecordQueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, handler, respect_handler_level=True)
+        self.listener.start()
+        self._stopped = False
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """ Flushes queued records and stops the listener thread"""
+        if not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+
+
+_setup_lock = threading.Lock()
+_stream_output = None
+
+# Like any library, stay silent unless the application configures logging
+logging.getLogger(ROOT_LOGGER).addHandler(logging.NullHandler())
+
+
+def enable_json_output(stream=None) -> None:
+    """ Writes the package's records as JSON lines to `stream` (stderr by default), from a background thread.
+
+    Records keep propagating to the application's handlers.
+    """
+    global _stream_output
+    with _setup_lock:
+        if _stream_output is not None:
+            return
+        stream_handler = logging.StreamHandler(stream)
+        stream_handler.setFormatter(JsonFormatter())
+        _stream_output = _QueuedOutput(stream_handler)
+        logging.getLogger(ROOT_LOGGER).addHandler(_stream_output.handler)
 
 
 class Logger:
 
     def __init__(self, name=None, level=None):
-        
+
         self.name = name
         self.level = level if level else "INFO"
 
@@ -16,20 +94,16 @@ class Logger:
         self.set_level(self.level)
 
     def setup(self, name: str) -> logging.Logger:
-        datefmt = '%Y-%m-%d %H:%M:%S %z'
-        formatter='[%(asctime)s] [%(process)d] [%(levelname)s] %(message)s'
-        
-        logging.basicConfig(format = formatter, datefmt=datefmt)
-        return logging.getLogger(name)
+        return logging.getLogger(f"{ROOT_LOGGER}.{name}" if name else ROOT_LOGGER)
 
     def set_level(self, level):
         if level:
-            if level.upper() in ['FATAL', 'CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG']:
+            if level.upper() in LEVELS:
                 self.log.setLevel(level.upper())
             else:
-                self.log.error(f"Invalid logging level: '{level}'")
+                self.log.error("Invalid logging level: '%s'", level)
         else:
-            self.log.error(f"Log level is undefined for logger: '{self.name}'")
+            self.log.error("Log level is undefined for logger: '%s'", self.name)
 
     def get_level(self, name=None):
         if name:
@@ -37,34 +111,45 @@ class Logger:
         else:
             return logging.getLevelName(self.log.getEffectiveLevel())
 
+    def is_enabled(self, level: str) -> bool:
+        return self.log.isEnabledFor(logging.getLevelName(level.upper()))
+
+    def sampled(self, rate: float, level: str = 'DEBUG') -> bool:
+        """ Returns whether a high-volume event should be logged, keeping `rate` of them"""
+        return rate > 0 and (rate >= 1 or random.random() < rate) and self.is_enabled(level)
+
     def save(self, path, level='DEBUG'):
         if path:
             path_dir = pathlib.Path(path).parent
             if  pathlib.Path.exists(path_dir):
-                formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
                 fh = logging.FileHandler(path)
                 fh.setLevel(level.upper())
-                fh.setFormatter(formatter)
-                self.log.addHandler(fh)   
+                fh.setFormatter(JsonFormatter())
+                self.log.addHandler(_QueuedOutput(fh).handler)
             else:
-                self.log.error(f"Invalid logging directory: '{path_dir}'")
+                self.log.error("Invalid logging directory: '%s'", path_dir)
         else:
-            self.log.warning(f"Log save path is undefined")
+            self.log.warning("Log save path is undefined")
+
+    def _log(self, level, msg, args, fields):
+        # Arguments are only merged into the message once a handler formats the record
+        if self.log.isEnabledFor(level):
+            self.log.log(level, msg, *args, extra={'fields': fields})
+
+    def fatal(self, msg, *args, **fields):
+        self._log(logging.FATAL, msg, args, fields)
 
-    def fatal(self, msg):
-        self.log.fatal(msg)
+    def critical(self, msg, *args, **fields):
+        self._log(logging.CRITICAL, msg, args, fields)
 
-    def critical(self, msg):
-        self.log.critical(msg)
+    def error(self, msg, *args, **fields):
+        self._log(logging.ERROR, msg, args, fields)
 
-    def error(self, msg):
-        self.log.error(msg)
+    def warning(self, msg, *args, **fields):
+        self._log(logging.WARNING, msg, args, fields)
 
-    def warning(self, msg):
-        self.log.warning(msg)
-   
-    def info(self, msg):
-        self.log.info(msg)
+    def info(self, msg, *args, **fields):
+        self._log(logging.INFO, msg, args, fields)
 
-    def debug(self, msg):
-        self.log.debug(msg)
\ No newline at end of file
+    def debug(self, msg, *args, **fields):
+        self._log(logging.DEBUG, msg, args, fields)
@@ -1,15 +1,17 @@
 import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 import pydantic
 
-__all__ = ['Connection', 'Endpoint']
+__all__ = ['Connection', 'Endpoint', 'Plan', 'Reconciliation', 'RegionShutdown', 'ShutdownResult']
 
 
 class Connection(pydantic.BaseModel):
-    success: Optional[bool]
-    endpoint: Optional[str]
-    new: Optional[bool]
+    success: Optional[bool] = None
+    endpoint: Optional[str] = None
+    new: Optional[bool] = None
+    region: Optional[str] = None
+    stage: Optional[str] = None
 
 
 class Endpoint(pydantic.BaseModel):
@@ -24,4 +26,39 @@ class Plan(pydantic.BaseModel):
     identity: str
     name: str 
     description: str
-    api_stages: list
\ No newline at end of file
+    api_stages: list
+
+class Reconciliation(pydantic.BaseModel):
+    region: str
+    available: bool = True
+    keep: List[Endpoint] = []
+    create: int = 0
+    delete: List[Endpoint] = []
+    missing_stages: Dict[str, List[str]] = {}
+    deployments: Dict[str, str] = {}
+
+class RegionShutdown(pydantic.BaseModel):
+    region: str
+    deleted_endpoints: int = 0
+    deleted_plans: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+class ShutdownResult(pydantic.BaseModel):
+    drained: bool
+    in_flight: int = 0
+    drain_seconds: float = 0.0
+    seconds: float = 0.0
+    regions: List[RegionShutdown] = []
+
+    @property
+    def success(self) -> bool:
+        return all(region.error is None for region in self.regions)
+
+    @property
+    def deleted_endpoints(self) -> int:
+        return sum(region.deleted_endpoints for region in self.regions)
+
+    @property
+    def deleted_plans(self) -> int:
+        return sum(region.deleted_plans for region in self.regions)
@@ -0,0 +1,19 @@
+# Provisioning profiles that can be passed to the ApiGateway class
+
+# REST API with a {proxy+} resource, plus a usage plan per API
+REST = "rest"
+
+# REST API without the usage plan, which is never attached to a key
+REST_LITE = "rest-lite"
+
+# API Gateway v2 HTTP API, with lower per-request latency and cost
+HTTP = "http"
+
+PROFILES = [REST, REST_LITE, HTTP]
+
+# AWS service backing each profile
+SERVICES = {
+    REST: "apigateway",
+    REST_LITE: "apigateway",
+    HTTP: "apigatewayv2",
+}
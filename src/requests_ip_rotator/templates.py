@@ -0,0 +1,121 @@
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+__all__ = ['render_template', 'template_body']
+
+
+# Bump when the rendered document changes, so stale cached templates are ignored
+TEMPLATE_VERSION = 1
+CACHE_DIR = pathlib.Path.home() / ".cache" / "requests_ip_rotator" / "templates"
+
+_render_lock = threading.Lock()
+
+FORWARDED_FOR = {
+    "integration.request.header.X-Forwarded-For": "method.request.header.X-My-X-Forwarded-For"
+}
+
+
+def _method(uri: str, parameters: list, request_parameters: dict) -> dict:
+    """ Returns an ANY method proxying to `uri`"""
+    return {
+        "x-amazon-apigateway-any-method": {
+            "parameters": parameters + [
+                {"name": "X-My-X-Forwarded-For", "in": "header", "required": False, "type": "string"},
+            ],
+            "responses": {},
+            "x-amazon-apigateway-integration": {
+                "type": "http_proxy",
+                "httpMethod": "ANY",
+                "uri": uri,
+                "connectionType": "INTERNET",
+                "passthroughBehavior": "when_no_match",
+                "requestParameters": request_parameters,
+            },
+        }
+    }
+
+
+def _render(site: str) -> str:
+    """ Renders the OpenAPI document of a REST API proxying every path to `site`"""
+    document = {
+        "swagger": "2.0",
+        "info": {"title": "", "version": str(TEMPLATE_VERSION)},
+        "schemes": ["https"],
+        "paths": {
+            "/": _method(site, [], dict(FORWARDED_FOR)),
+            "/{proxy+}": _method(
+                f"{site}/{{proxy}}",
+                [{"name": "proxy", "in": "path", "required": True, "type": "string"}],
+                {"integration.request.path.proxy": "method.request.path.proxy", **FORWARDED_FOR},
+            ),
+        },
+    }
+    return json.dumps(document, sort_keys=True)
+
+
+def _render_http(site: str) -> str:
+    """ Renders the OpenAPI document of an HTTP API whose $default route proxies every path to `site`"""
+    document = {
+        "openapi": "3.0.1",
+        "info": {"title": "", "version": str(TEMPLATE_VERSION)},
+        "paths": {
+            "/$default": {
+                "x-amazon-apigateway-any-method": {
+                    "isDefaultRoute": True,
+                    "x-amazon-apigateway-integration": {
+                        "type": "http_proxy",
+                        "httpMethod": "ANY",
+                        "uri": site,
+                        "connectionType": "INTERNET",
+                        "payloadFormatVersion": "1.0",
+                        # Forward the request path under the site's own path, like {site}/{proxy} above
+                        "requestParameters": {"overwrite:path": f"{urlparse(site).path}$request.path"},
+                    },
+                }
+            }
+        },
+    }
+    return json.dumps(document, sort_keys=True)
+
+
+@functools.lru_cache(maxsize=None)
+def render_template(site: str, service: str = "apigateway") -> str:
+    """ Returns the site's OpenAPI document for `service`, rendered once and cached on disk for other processes"""
+    digest = hashlib.sha256(f"{TEMPLATE_VERSION}:{service}:{site}".encode()).hexdigest()
+    path = CACHE_DIR / f"{digest}.json"
+
+    # Regions are provisioned concurrently: the first thread renders, the others read its cache file
+    with _render_lock:
+        try:
+            # A truncated or corrupt file is rendered again and overwritten
+            template = path.read_text()
+            json.loads(template)
+            return template
+        except (OSError, ValueError):
+            pass
+
+        template = _render_http(site) if service == "apigatewayv2" else _render(site)
+        try:
+            # Write to a temporary file first so concurrent processes never read a partial template
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "w") as tmp_file:
+                tmp_file.write(template)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The cache is only an optimisation, rendering again is always possible
+            pass
+        return template
+
+
+def template_body(site: str, name: str, service: str = "apigateway") -> bytes:
+    """ Returns the import body for an API named `name`"""
+    document = json.loads(render_template(site, service))
+    document["info"]["title"] = name
+    return json.dumps(document).encode()
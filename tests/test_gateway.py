@@ -0,0 +1,328 @@
+import collections
+import datetime
+import itertools
+import json
+import threading
+
+import pytest
+import requests
+import requests.adapters
+
+import requests_ip_rotator.gateway as gateway
+import requests_ip_rotator.templates as templates
+from requests_ip_rotator import ApiGateway
+from requests_ip_rotator.profiles import SERVICES
+
+
+REGIONS = ["us-east-1", "eu-west-1"]
+SITE = "https://example.com"
+
+
+class FakeClient:
+    """ In-memory apigateway client shared by every region of a test"""
+
+    def __init__(self, state, region, service):
+        self.state = state
+        self.region = region
+        self.service = service
+
+    @property
+    def apis(self):
+        return self.state.apis[(self.service, self.region)]
+
+    @property
+    def plans(self):
+        return self.state.plans[self.region]
+
+    def _call(self, name):
+        with self.state.lock:
+            self.state.calls[(self.region, name)] += 1
+        failure = self.state.failures.get((self.region, name))
+        if failure:
+            raise failure
+
+    def _new_api(self, name):
+        api_id = f"{next(self.state.ids):010d}"
+        self.apis[api_id] = {
+            'id': api_id, 'ApiId': api_id,
+            'name': name, 'Name': name,
+            'createdDate': datetime.datetime.now(datetime.timezone.utc),
+            'CreatedDate': datetime.datetime.now(datetime.timezone.utc),
+            'apiKeySource': 'HEADER', 'endpointConfiguration': {'types': ['REGIONAL']},
+            'ProtocolType': 'HTTP',
+            'stages': {},
+        }
+        return api_id
+
+    def get_paginator(self, operation):
+        client = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                client._call(operation)
+                if operation == 'get_usage_plans':
+                    yield {'items': list(client.plans.values())}
+                else:
+                    items = list(client.apis.values())
+                    yield {'items': items, 'Items': items}
+        return Paginator()
+
+    # apigateway
+    def import_rest_api(self, body, **kwargs):
+        self._call('import_rest_api')
+        return {'id': self._new_api(json.loads(body)['info']['title'])}
+
+    def create_deployment(self, restApiId, stageName=None, **kwargs):
+        self._call('create_deployment')
+        deployment_id = f"deployment-{restApiId}"
+        if stageName:
+            self.apis[restApiId]['stages'][stageName] = deployment_id
+        return {'id': deployment_id}
+
+    def create_stage(self, restApiId=None, stageName=None, deploymentId=None, ApiId=None, StageName=None, **kwargs):
+        self._call('create_stage')
+        self.apis[restApiId or ApiId]['stages'][stageName or StageName] = deploymentId
+
+    def get_stages(self, restApiId=None, ApiId=None):
+        self._call('get_stages')
+        stages = self.apis[restApiId or ApiId]['stages']
+        return {
+            'item': [{'stageName': name, 'deploymentId': dep} for name, dep in stages.items()],
+            'Items': [{'StageName': name, 'DeploymentId': dep} for name, dep in stages.items()],
+        }
+
+    def create_usage_plan(self, name, description, apiStages, **kwargs):
+        self._call('create_usage_plan')
+        plan_id = f"{next(self.state.ids):010d}"
+        self.plans[plan_id] = {'id': plan_id, 'name': name, 'description': description, 'apiStages': apiStages}
+        return {'id': plan_id}
+
+    def update_usage_plan(self, usagePlanId, patchOperations):
+        self._call('update_usage_plan')
+        for operation in patchOperations:
+            api_id, stage = operation['value'].split(':')
+            self.plans[usagePlanId]['apiStages'].append({'apiId': api_id, 'stage': stage})
+
+    def delete_rest_api(self, restApiId):
+        self._call('delete_rest_api')
+        return self.apis.pop(restApiId)
+
+    def delete_usage_plan(self, usagePlanId):
+        self._call('delete_usage_plan')
+        return self.plans.pop(usagePlanId)
+
+    # apigatewayv2
+    def import_api(self, Body, **kwargs):
+        self._call('import_api')
+        document = json.loads(Body)
+        api_id = self._new_api(document['info']['title'])
+        self.apis[api_id]['document'] = document
+        return {'ApiId': api_id}
+
+    def delete_api(self, ApiId):
+        self._call('delete_api')
+        return self.apis.pop(ApiId)
+
+
+class FakeState:
+
+    def __init__(self):
+        self.apis = collections.defaultdict(dict)
+        self.plans = collections.defaultdict(dict)
+        self.calls = collections.Counter()
+        self.failures = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        return sum(calls for (_, call), calls in self.calls.items() if call == name)
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    state = FakeState()
+
+    class FakeAWS:
+        def __init__(self, region, access_id, access_secret, log_level, service="apigateway"):
+            self.region = region
+            self.service = service
+            self.client = FakeClient(state, region, service)
+
+    monkeypatch.setattr(gateway, 'AWS', FakeAWS)
+    return state
+
+
+def test_reconcile_shrink_keeps_plans_of_kept_apis(aws):
+    api_gateway = ApiGateway(SITE, regions=REGIONS)
+    api_gateway.reconcile(count=2)
+    api_gateway.reconcile(count=1)
+
+    assert aws.count('delete_rest_api') == 2
+    assert aws.count('delete_usage_plan') == 2
+    for region in REGIONS:
+        kept = set(aws.apis[("apigateway", region)])
+        assert len(kept) == 1
+        assert {plan['description'] for plan in aws.plans[region].values()} == kept
+
+
+def test_reconcile_without_changes_makes_no_mutating_calls(aws):
+    ApiGateway(SITE, regions=REGIONS).reconcile(count=2)
+    aws.calls.clear()
+
+    # A later rollout, from a fresh object with the default options
+    result = ApiGateway(SITE, regions=REGIONS).reconcile(count=2)
+
+    assert result['created'] == 0 and result['deleted'] == 0
+    assert all(name.startswith('get_') for _, name in aws.calls)
+
+
+def test_shutdown_keeps_apis_of_other_instances(aws):
+    first = ApiGateway(SITE, regions=REGIONS)
+    first.start()
+
+    second = ApiGateway(SITE, regions=REGIONS)
+    second.start()
+    assert second.shutdown().deleted_endpoints == 2
+    assert all(len(aws.apis[("apigateway", region)]) == 1 for region in REGIONS)
+
+    # Adopted APIs are taken over, and deleted with the adopting object
+    adopting = ApiGateway(SITE, regions=REGIONS, adopt_existing=True)
+    adopting.start()
+    assert aws.count('import_rest_api') == 4
+    assert adopting.shutdown().deleted_endpoints == 2
+
+    assert all(not aws.apis[("apigateway", region)] for region in REGIONS)
+
+
+def test_start_returns_hostnames_that_can_be_saved(aws, monkeypatch):
+    api_gateway = ApiGateway(SITE, regions=REGIONS, stages=2)
+    endpoints = api_gateway.start(count=2)
+    assert len(endpoints) == 4
+    assert all(isinstance(endpoint, str) for endpoint in endpoints)
+
+    assert len(api_gateway.connections) == 8
+    assert {(c.region, c.stage) for c in api_gateway.connections} == {
+        (region, stage) for region in REGIONS for stage in ("ProxyStage", "ProxyStage2")
+    }
+
+    restored = ApiGateway(SITE, regions=REGIONS, stages=2)
+    assert restored.start(endpoints=json.loads(json.dumps(endpoints))) == endpoints
+
+    sent = []
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, 'send', lambda self, request, *args: sent.append(request.url))
+    for _ in range(200):
+        restored.send(requests.Request('GET', f"{SITE}/path").prepare())
+    assert {url.split("/")[3] for url in sent} == {"ProxyStage", "ProxyStage2"}
+    assert {url.split("/")[2] for url in sent} == set(endpoints)
+
+
+def test_reconcile_adds_missing_stages_to_deployment_and_plan(aws):
+    api_gateway = ApiGateway(SITE, regions=REGIONS)
+    api_gateway.start()
+    api_gateway.stage_names.append("ProxyStage2")
+    aws.calls.clear()
+
+    api_gateway.reconcile()
+
+    assert aws.count('create_deployment') == 0
+    assert aws.count('create_stage') == 2
+    for region in REGIONS:
+        for api in aws.apis[("apigateway", region)].values():
+            assert set(api['stages']) == {"ProxyStage", "ProxyStage2"}
+            assert len(set(api['stages'].values())) == 1
+        for plan in aws.plans[region].values():
+            assert {stage['stage'] for stage in plan['apiStages']} == {"ProxyStage", "ProxyStage2"}
+
+
+@pytest.mark.parametrize("profile, step, stages", [
+    ("rest", 'create_deployment', 1),
+    ("rest", 'create_deployment', 2),
+    ("http", 'create_stage', 1),
+])
+def test_reconcile_replaces_apis_without_deployment(aws, profile, step, stages):
+    aws.failures[("eu-west-1", step)] = RuntimeError(f"{step} failed")
+    with pytest.raises(RuntimeError):
+        ApiGateway(SITE, regions=REGIONS, stages=stages, profile=profile).start()
+    del aws.failures[("eu-west-1", step)]
+
+    result = ApiGateway(SITE, regions=REGIONS, stages=stages, profile=profile).reconcile()
+
+    assert result['created'] == 1 and result['deleted'] == 1
+    for region in REGIONS:
+        (api,) = aws.apis[(SERVICES[profile], region)].values()
+        assert len(api['stages']) == stages
+    assert sorted(url.split(".")[2] for url in result['endpoints']) == sorted(REGIONS)
+
+
+def test_context_manager_cleans_up_when_start_fails(aws):
+    regions = ["us-east-1", "eu-west-1", "us-west-2"]
+    aws.failures[("eu-west-1", 'import_rest_api')] = RuntimeError("import failed")
+
+    with pytest.raises(RuntimeError):
+        with ApiGateway(SITE, regions=regions):
+            pass
+
+    assert aws.count('import_rest_api') == 3
+    assert all(not aws.apis[("apigateway", region)] for region in regions)
+    assert all(not aws.plans[region] for region in regions)
+
+
+@pytest.mark.parametrize("profile, step", [
+    ("rest", 'create_deployment'),
+    ("rest", 'create_usage_plan'),
+    ("http", 'create_stage'),
+])
+def test_context_manager_cleans_up_half_built_apis(aws, profile, step):
+    aws.failures[("eu-west-1", step)] = RuntimeError(f"{step} failed")
+
+    with pytest.raises(RuntimeError):
+        with ApiGateway(SITE, regions=REGIONS, profile=profile):
+            pass
+
+    assert aws.count(step) == 2
+    assert all(not apis for apis in aws.apis.values())
+
+
+def test_failed_start_keeps_created_endpoints(aws):
+    aws.failures[("eu-west-1", 'import_rest_api')] = RuntimeError("import failed")
+    api_gateway = ApiGateway(SITE, regions=REGIONS)
+
+    with pytest.raises(RuntimeError):
+        api_gateway.start()
+
+    assert api_gateway.endpoints == [f"{api_id}.execute-api.us-east-1.amazonaws.com" for api_id in aws.apis[("apigateway", "us-east-1")]]
+    assert api_gateway.shutdown().deleted_endpoints == 1
+
+
+@pytest.mark.parametrize("site, path", [
+    ("https://example.com", "$request.path"),
+    ("http://www.google.com/en", "/en$request.path"),
+])
+def test_http_profile_keeps_site_path(aws, site, path):
+    api_gateway = ApiGateway(site, regions=["us-east-1"], profile="http")
+    api_gateway.start()
+
+    assert aws.count('import_api') == 1 and aws.count('create_stage') == 1
+    (api,) = aws.apis[("apigatewayv2", "us-east-1")].values()
+    assert set(api['stages']) == {"$default"}
+    integration = api['document']['paths']['/$default']['x-amazon-apigateway-any-method']['x-amazon-apigateway-integration']
+    assert integration['uri'] == site
+    assert integration['requestParameters'] == {"overwrite:path": path}
+
+
+def test_rest_lite_imports_one_template_per_region(aws, monkeypatch, tmp_path):
+    regions = ["us-east-1", "eu-west-1", "us-west-2", "ap-south-1"]
+    renders = []
+    render = templates._render
+    monkeypatch.setattr(templates, '_render', lambda site: renders.append(site) or render(site))
+    monkeypatch.setattr(templates, 'CACHE_DIR', tmp_path)
+    templates.render_template.cache_clear()
+
+    ApiGateway(SITE, regions=regions, profile="rest-lite").start()
+    templates.render_template.cache_clear()
+
+    assert aws.count('import_rest_api') == len(regions)
+    assert aws.count('create_deployment') == len(regions)
+    for name in ('create_resource', 'put_method', 'put_integration', 'create_usage_plan'):
+        assert aws.count(name) == 0
+    assert renders == [SITE]
@@ -0,0 +1,50 @@
+import io
+import json
+import logging
+
+from requests_ip_rotator.aws import AWS
+from requests_ip_rotator.logger import JsonFormatter, Logger, _QueuedOutput
+
+
+def test_records_reach_application_handlers(caplog):
+    logger = Logger('test-propagation', level='debug')
+    with caplog.at_level(logging.DEBUG):
+        logger.debug("Removed API '%s'", "abc", region="us-east-1")
+
+    record = caplog.records[-1]
+    assert record.getMessage() == "Removed API 'abc'"
+    assert record.fields == {'region': "us-east-1"}
+
+
+def test_queued_output_formats_on_listener_thread():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    output = _QueuedOutput(handler)
+    logger = logging.getLogger('requests_ip_rotator.test-queue')
+    logger.addHandler(output.handler)
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed to delete API %s", "abc")
+    output.stop()
+
+    entry = json.loads(stream.getvalue())
+    assert entry['message'] == "Failed to delete API abc"
+    assert "ValueError: boom" in entry['exception']
+
+
+def test_json_output_is_opt_in():
+    root = logging.getLogger('requests_ip_rotator')
+    assert root.propagate
+    assert all(isinstance(handler, logging.NullHandler) for handler in root.handlers)
+
+
+def test_aws_clients_share_one_logger():
+    level = logging.getLogger("requests_ip_rotator.aws-services").level
+    first = AWS("us-east-1", "id", "secret", "debug")
+    second = AWS("eu-west-1", "id", "secret", "error")
+
+    assert first._logger is second._logger
+    assert logging.getLogger("requests_ip_rotator.aws-services").level == level
@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+import requests_ip_rotator.templates as templates
+
+
+SITE = "https://example.com"
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(templates, 'CACHE_DIR', tmp_path)
+    templates.render_template.cache_clear()
+    yield tmp_path
+    templates.render_template.cache_clear()
+
+
+def test_corrupt_cached_template_is_rendered_again(cache_dir):
+    template = templates.render_template(SITE)
+    (path,) = cache_dir.glob("*.json")
+    path.write_text(template[:len(template) // 2])
+    templates.render_template.cache_clear()
+
+    assert templates.render_template(SITE) == template
+    assert path.read_text() == template
+    assert json.loads(templates.template_body(SITE, "name"))["info"]["title"] == "name"